@@ -0,0 +1,15 @@
+import os
+from functools import lru_cache
+from dotenv import load_dotenv
+from openai import OpenAI, Timeout
+
+load_dotenv()
+
+CHAT_MODEL = "gpt-3.5-turbo"
+# The SDK default is 600s per request; a stuck call would pin a /query worker thread that long
+LLM_TIMEOUT = Timeout(30.0, connect=5.0)
+
+@lru_cache(maxsize=1)
+def openai_client() -> OpenAI:
+    """Process-wide OpenAI client (one HTTP pool), created on first use rather than at import."""
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=LLM_TIMEOUT)
@@ -1,8 +1,14 @@
 import os
 import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from langchain_core.documents import Document
 from typing import List, Dict
 
+SECTION_TITLE_RE = re.compile(r"(Section\s+\d+[:.])")
+PAGE_BREAK_RE = re.compile(r"\f|\n\s*Page\s+\d+\s+of\s+\d+")
+
 # ---------------------------
 # 1. Extract Product Name from SDS filename
 # ---------------------------
@@ -18,17 +24,16 @@ def extract_product_name(file_path: str) -> str:
 # ---------------------------
 def apply_file_level_metadata(file_path: str, raw_text: str) -> List[Document]:
     product_name = extract_product_name(file_path)
-    sections = re.split(r"(?=Section\s+\d+[:.])", raw_text)
+    # One pass over the headings; each section runs from its heading to the next one
+    bounds = [(0, "UNKNOWN")] + [(m.start(), m.group(1)) for m in SECTION_TITLE_RE.finditer(raw_text)]
+    ends = [start for start, _ in bounds[1:]] + [len(raw_text)]
     documents = []
 
-    for sec in sections:
-        sec_clean = sec.strip()
+    for (start, section_title), end in zip(bounds, ends):
+        sec_clean = raw_text[start:end].strip()
         if not sec_clean:
             continue
 
-        match = re.match(r"(Section\s+\d+[:.])", sec_clean)
-        section_title = match.group(1) if match else "UNKNOWN"
-
         documents.append(
             Document(
                 page_content=sec_clean,
@@ -46,17 +51,13 @@ def apply_file_level_metadata(file_path: str, raw_text: str) -> List[Document]:
 # ---------------------------
 def split_pages(raw_text: str) -> List[str]:
     """Split text into pages based on form feed or SDS page numbers."""
-    return re.split(r"\f|\n\s*Page\s+\d+\s+of\s+\d+", raw_text)
+    return PAGE_BREAK_RE.split(raw_text)
 
 def identify_repeated_headers_footers(pages: List[str]) -> Dict[str, int]:
     """Identify candidate header/footer lines occurring on most pages."""
-    line_frequency = {}
-    for page in pages:
-        for line in page.splitlines():
-            line = line.strip()
-            if len(line) < 5:
-                continue
-            line_frequency[line] = line_frequency.get(line, 0) + 1
+    line_frequency = Counter(
+        line for page in pages for line in map(str.strip, page.splitlines()) if len(line) >= 5
+    )
 
     # Consider a header/footer if it appears in >70% of pages
     threshold = max(2, int(len(pages) * 0.7))
@@ -64,33 +65,32 @@ def identify_repeated_headers_footers(pages: List[str]) -> Dict[str, int]:
 
 def remove_headers_footers(pages: List[str], repeated_lines: Dict[str, int]) -> str:
     """Remove repeated headers/footers from pages."""
-    clean_pages = []
-    for page in pages:
-        clean_lines = [ln for ln in page.splitlines() if ln.strip() not in repeated_lines]
-        clean_pages.append("\n".join(clean_lines))
-    return "\n".join(clean_pages)
+    return "\n".join(
+        ln for page in pages for ln in page.splitlines() if ln.strip() not in repeated_lines
+    )
 
 # ---------------------------
 # 4. Loader Function
 # ---------------------------
-def load_sds_documents(folder_path: str = "data/sds_text/") -> List[Document]:
-    """Load, clean, and prepare SDS documents."""
-    docs = []
-    for file_name in os.listdir(folder_path):
-        if not file_name.endswith(".txt"):
-            continue
-
-        file_path = os.path.join(folder_path, file_name)
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            raw_text = f.read()
+def _load_text_file(file_path: str) -> List[Document]:
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        raw_text = f.read()
 
-        # Step 1: Split pages and remove headers/footers
-        pages = split_pages(raw_text)
-        repeated_lines = identify_repeated_headers_footers(pages)
-        clean_text = remove_headers_footers(pages, repeated_lines)
+    # Step 1: Split pages and remove headers/footers
+    pages = split_pages(raw_text)
+    repeated_lines = identify_repeated_headers_footers(pages)
+    clean_text = remove_headers_footers(pages, repeated_lines)
 
-        # Step 2: Create Documents with metadata
-        file_docs = apply_file_level_metadata(file_path, clean_text)
-        docs.extend(file_docs)
+    # Step 2: Create Documents with metadata
+    return apply_file_level_metadata(file_path, clean_text)
 
-    return docs
+def load_sds_documents(folder_path: str = "data/sds_text/") -> List[Document]:
+    """Load, clean, and prepare SDS documents."""
+    file_paths = [
+        os.path.join(folder_path, file_name)
+        for file_name in sorted(os.listdir(folder_path))
+        if file_name.endswith(".txt")
+    ]
+    # Mostly file IO, so threads are enough; map keeps the sorted file order
+    with ThreadPoolExecutor() as ex:
+        return list(chain.from_iterable(ex.map(_load_text_file, file_paths)))
@@ -1,6 +1,11 @@
+import multiprocessing
 import os
 import re
-from typing import List, Tuple
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import Iterable, List, Optional, Tuple
 import fitz  # PyMuPDF
 import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -11,59 +16,58 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-CHROMA_DIR = "chroma_store"
 PDF_DIR = "data/sds_pdf"
 
 # --------------------------
 # PDF reading (page-wise) + optional boilerplate filtering
 # --------------------------
-def _read_pdf_pages(pdf_path: str) -> List[str]:
+_PDF_TEXT_FLAGS = fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_MEDIABOX_CLIP
+_LINE_KEY = itemgetter(5, 6)  # (block_no, line_no) of a "words" tuple
+
+def _read_pdf_pages(pdf_path: str) -> List[List[str]]:
+    """
+    Return each page as a list of non-empty lines, rebuilt from MuPDF's word list.
+    Words come pre-split on whitespace, so the lines need no further normalisation.
+    """
     pages = []
-    with fitz.open(pdf_path) as pdf:
+    with fitz.open(pdf_path, filetype="pdf") as pdf:
         for page in pdf:
-            txt = page.get_text("text") or ""
-            pages.append(txt)
+            words = page.get_text("words", flags=_PDF_TEXT_FLAGS)
+            pages.append([" ".join(w[4] for w in line) for _, line in groupby(words, key=_LINE_KEY)])
     return pages
 
-def _find_repeated_lines(pages: List[str], threshold: float = 0.6) -> set:
+# Boilerplate header/footer lines dropped regardless of frequency
+_BOILERPLATE_RES = tuple(
+    re.compile(pat, re.IGNORECASE)
+    for pat in (
+        r"^Page\s+\d+\s+of\s+\d+",
+        r"^Revision\s+date",
+        r"^Date\s+of\s+print",
+        r"^SAFETY\s+DATA\s+SHEET",
+        r"according to Regulation",
+        r"^Document number",
+    )
+)
+
+def _find_repeated_lines(pages: List[List[str]], threshold: float = 0.6) -> set:
     """Identify header/footer lines repeated on >= threshold of pages."""
     if not pages:
         return set()
-    freq = {}
-    for p in pages:
-        for line in p.splitlines():
-            ln = re.sub(r"\s+", " ", line).strip()
-            if ln:
-                freq[ln] = freq.get(ln, 0) + 1
+    freq = Counter(ln for p in pages for ln in p)
     cutoff = max(2, int(len(pages) * threshold))
     repeated = {line for line, c in freq.items() if c >= cutoff}
 
     # Add common boilerplate patterns (conservative)
-    common = [
-        r"^Page\s+\d+\s+of\s+\d+",
-        r"^Revision\s+date",
-        r"^Date\s+of\s+print",
-        r"^SAFETY\s+DATA\s+SHEET",
-        r"according to Regulation",
-        r"^Document number",
-    ]
-    for s in list(freq.keys()):
-        for pat in common:
-            if re.search(pat, s, re.IGNORECASE):
+    for s in freq:
+        for pat in _BOILERPLATE_RES:
+            if pat.search(s):
                 repeated.add(s)
                 break
     return repeated
 
-def _strip_repeated_lines(pages: List[str], repeated: set) -> str:
-    cleaned_pages = []
-    for p in pages:
-        kept = []
-        for line in p.splitlines():
-            ln = re.sub(r"\s+", " ", line).strip()
-            if ln and ln not in repeated:
-                kept.append(line)
-        cleaned_pages.append("\n".join(kept))
-    return "\n".join(cleaned_pages)
+def _strip_repeated_lines(pages: List[List[str]], repeated: set) -> str:
+    # One join over all kept lines; no per-page strings or lists in between
+    return "\n".join(ln for p in pages for ln in p if ln not in repeated)
 
 def _read_pdf_text_clean(pdf_path: str) -> str:
     pages = _read_pdf_pages(pdf_path)
@@ -77,7 +81,7 @@ def _read_pdf_text_clean(pdf_path: str) -> str:
 # --------------------------
 # Section 1 extraction
 # --------------------------
-_SECTION1_BLOCK_PATTERNS = [
+_SECTION1_BLOCK_PATTERNS = [re.compile(pat, re.MULTILINE) for pat in (
     # "Section 1: ..." up to next section 2 marker
     r"(?is)^\s*Section\s*0*1\b.*?(?=^\s*Section\s*0*2\b|^\s*2[\.\-]?\s+|^\s*2\s+[A-Z]|$\Z)",
     r"(?is)^\s*SECTION\s*0*1\b.*?(?=^\s*SECTION\s*0*2\b|^\s*2[\.\-]?\s+|^\s*2\s+[A-Z]|$\Z)",
@@ -85,14 +89,14 @@ _SECTION1_BLOCK_PATTERNS = [
     r"(?is)^\s*1[\.\-]?\s+[A-Z][^\n]*\n.*?(?=^\s*2[\.\-]?\s+|^\s*2\s+[A-Z]|^\s*Section\s*0*2\b|^\s*SECTION\s*0*2\b|$\Z)",
     # "1 IDENTIFICATION" (all caps, no punctuation)
     r"(?is)^\s*1\s+[A-Z][A-Z \-]{3,}\n.*?(?=^\s*2\s+[A-Z]|^\s*2[\.\-]?\s+|^\s*Section\s*0*2\b|^\s*SECTION\s*0*2\b|$\Z)",
-]
+)]
 
 def _extract_section1_block(full_text: str) -> str:
     for pat in _SECTION1_BLOCK_PATTERNS:
-        m = re.search(pat, full_text, re.MULTILINE)
+        m = pat.search(full_text)
         if m:
             s1 = m.group(0).strip()
-            logger.debug("Section 1 block found with pattern: %s", pat)
+            logger.debug("Section 1 block found with pattern: %s", pat.pattern)
             return s1
     # Fallback: first ~2500 chars
     logger.warning("Section 1 block not found; using first 2500 chars as fallback.")
@@ -118,52 +122,58 @@ _IGNORE_LABELS = [
     "Supplier", "Manufacturer", "Company", "Emergency", "Address", "Phone",
 ]
 
+_IGNORE_LABEL_RE = re.compile("|".join(re.escape(ig) for ig in _IGNORE_LABELS), re.IGNORECASE)
+_NOISY_TAIL_RE = re.compile(r"(?:SDS\s*No\.?|CAS\s*No\.?).*$", re.IGNORECASE)
+_USE_VALUE_RE = re.compile(r"(?i)\b(use|intended)\b")
+# A whole line that is a name label, optionally followed by ":" and a value
+_LABEL_LINE_RE = re.compile(
+    r"^[^\S\n]*(?P<label>"
+    + "|".join(r"[^\S\n]+".join(map(re.escape, lab.split())) for lab in _NAME_LABELS)
+    + r")[^\S\n]*(?::(?P<value>[^\n]*))?$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_NEXT_LINE_RE = re.compile(r"\s*(\S[^\n]*)")
+
 def _is_ignored_label(label: str) -> bool:
-    lab = label.strip().lower()
-    return any(lab.startswith(ig.lower()) for ig in _IGNORE_LABELS)
+    return _IGNORE_LABEL_RE.match(label.strip()) is not None
 
 def _clean_value(val: str) -> str:
-    v = re.sub(r"\s+", " ", val).strip()
+    v = " ".join(val.split())
     # Trim super-noisy tail tokens
-    v = re.sub(r"(?:SDS\s*No\.?|CAS\s*No\.?).*$", "", v, flags=re.IGNORECASE).strip()
+    v = _NOISY_TAIL_RE.sub("", v).strip()
     return v
 
 def extract_product_name(full_text: str, file_name: str) -> str:
     s1 = _extract_section1_block(full_text)
     logger.debug("Section 1 text (first 600 chars): %s", s1[:600])
 
-    lines = [re.sub(r"\s+", " ", ln).strip() for ln in s1.splitlines() if ln.strip()]
-    # Scan lines for label:value or label on one line, value on next
-    for i, ln in enumerate(lines):
-        # Split on ":" if present; otherwise try label-only + lookahead
-        if ":" in ln:
-            left, right = [t.strip() for t in ln.split(":", 1)]
-            if _is_ignored_label(left):
-                continue
-            # Match acceptable labels (with variations like "Trade Name")
-            if any(re.fullmatch(fr"{lab}", left, flags=re.IGNORECASE) for lab in _NAME_LABELS):
-                val = _clean_value(right)
-                # Avoid lines like "Product: Use: Automotive Degreaser"
-                if re.match(r"(?i)\b(use|intended)\b", val):
-                    continue
-                if val:
-                    logger.info("Extracted product name (label:value) for %s: %s", file_name, val)
-                    return val
-        else:
-            # If no colon, see if the line is a label and the next line is the value
-            if any(re.fullmatch(fr"{lab}", ln, flags=re.IGNORECASE) for lab in _NAME_LABELS):
-                if _is_ignored_label(ln):
-                    continue
-                # next non-empty line as value
-                j = i + 1
-                while j < len(lines) and not lines[j].strip():
-                    j += 1
-                if j < len(lines):
-                    val = _clean_value(lines[j])
-                    # do not accept if next line looks like another label or an ignored label
-                    if not any(re.fullmatch(fr"{lab}", val, flags=re.IGNORECASE) for lab in _NAME_LABELS) and not _is_ignored_label(val):
-                        logger.info("Extracted product name (label\\nvalue) for %s: %s", file_name, val)
-                        return val
+    # One sweep over Section 1 for "label: value" or a bare label line, in document order
+    for m in _LABEL_LINE_RE.finditer(s1):
+        raw = m.group("value") or ""
+        if raw.strip():
+            val = _clean_value(raw)
+            # Avoid lines like "Product: Use: Automotive Degreaser"; a value that cleans
+            # away to nothing ("Product Name: CAS No. 5") does not borrow the next line
+            if val and not _USE_VALUE_RE.match(val):
+                logger.info("Extracted product name (label:value) for %s: %s", file_name, val)
+                return val
+            continue
+
+        # Label without a value on its line: next non-empty line as value
+        nxt = _NEXT_LINE_RE.match(s1, m.end())
+        if nxt:
+            val = _clean_value(nxt.group(1))
+            # Not another name label (the sweep reaches that line itself), an ignored label,
+            # a use statement or a section heading
+            if (
+                val
+                and not _LABEL_LINE_RE.match(val)
+                and not _is_ignored_label(val)
+                and not _USE_VALUE_RE.match(val)
+                and not _SECTION_SPLIT_LOOKAHEAD.match(val)
+            ):
+                logger.info("Extracted product name (label\\nvalue) for %s: %s", file_name, val)
+                return val
 
     logger.warning("Product name NOT found in Section 1 for %s; returning UNKNOWN", file_name)
     return "UNKNOWN"
@@ -185,11 +195,24 @@ _SECTION_SPLIT_LOOKAHEAD = re.compile(
     re.MULTILINE,
 )
 
+# Every heading form above starts its line with "S" or a digit; only those lines are handed
+# to the full lookahead. Same flags as the lookahead, so "ſ" and non-ASCII digits still pass.
+_HEADING_CANDIDATE_RE = re.compile(r"^[^\S\n]*[\dS]", re.IGNORECASE | re.MULTILINE)
+
+def _heading_offsets(full_text: str) -> List[int]:
+    return [
+        m.start()
+        for m in _HEADING_CANDIDATE_RE.finditer(full_text)
+        if _SECTION_SPLIT_LOOKAHEAD.match(full_text, m.start())
+    ]
+
 def _split_into_sections(full_text: str) -> List[Tuple[str, str]]:
-    parts = _SECTION_SPLIT_LOOKAHEAD.split(full_text)
+    offsets = _heading_offsets(full_text)
     chunks: List[Tuple[str, str]] = []
 
-    if len(parts) > 1:
+    if offsets:
+        bounds = [0, *offsets, len(full_text)]
+        parts = (full_text[a:b] for a, b in zip(bounds, bounds[1:]))
         for part in parts:
             part = part.strip()
             if not part:
@@ -209,38 +232,54 @@ def _split_into_sections(full_text: str) -> List[Tuple[str, str]]:
 # --------------------------
 # Public API: return Documents (NOT a Chroma object)
 # --------------------------
-def load_sds_documents(pdf_dir: str = PDF_DIR) -> List[Document]:
+def _process_one_pdf(fpath: str) -> List[Document]:
+    """Read one PDF into section Documents. Top-level so worker processes can pickle it."""
+    fname = os.path.basename(fpath)
+    logger.info("Processing PDF: %s", fname)
+
+    text = _read_pdf_text_clean(fpath)
+    if not text:
+        logger.warning("No text found in %s; skipping.", fname)
+        return []
+
+    product_name = extract_product_name(text, fname)
+    sections = _split_into_sections(text)
+
+    documents = [
+        Document(
+            page_content=section_text,
+            metadata={
+                "source": fpath,           # full path is handy later
+                "file_name": fname,
+                "product_name": product_name,  # <<< consistent key
+                "section": section_title,
+                "format": "pdf",
+            },
+        )
+        for section_title, section_text in sections
+    ]
+    logger.info("Added %d chunks from %s (product_name=%s)", len(sections), fname, product_name)
+    return documents
+
+def load_sds_documents(pdf_dir: str = PDF_DIR, file_names: Optional[Iterable[str]] = None) -> List[Document]:
     """
     Read PDFs, clean text, extract product_name, split into sections,
     and return a list of LangChain Documents. No DB writes here.
+    If file_names is given, only those files in pdf_dir are read.
+    PDFs are parsed in parallel worker processes; output order follows the sorted file names.
     """
-    documents: List[Document] = []
-    for fname in sorted(os.listdir(pdf_dir)):
-        if not fname.lower().endswith(".pdf"):
-            continue
-        fpath = os.path.join(pdf_dir, fname)
-        logger.info("Processing PDF: %s", fname)
-
-        text = _read_pdf_text_clean(fpath)
-        if not text:
-            logger.warning("No text found in %s; skipping.", fname)
-            continue
+    names = os.listdir(pdf_dir) if file_names is None else file_names
+    fpaths = [os.path.join(pdf_dir, fname) for fname in sorted(names) if fname.lower().endswith(".pdf")]
+    if len(fpaths) <= 1:
+        return [doc for fpath in fpaths for doc in _process_one_pdf(fpath)]
 
-        product_name = extract_product_name(text, fname)
-        sections = _split_into_sections(text)
-
-        for section_title, section_text in sections:
-            documents.append(
-                Document(
-                    page_content=section_text,
-                    metadata={
-                        "source": fpath,           # full path is handy later
-                        "file_name": fname,
-                        "product_name": product_name,  # <<< consistent key
-                        "section": section_title,
-                        "format": "pdf",
-                    },
-                )
-            )
-        logger.info("Added %d chunks from %s (product_name=%s)", len(sections), fname, product_name)
-    return documents
\ No newline at end of file
+    # spawn, not fork: the caller is a threaded server process (event loop, log listener), and
+    # forked workers would inherit its QueueHandler and drop their log records. Spawned workers
+    # re-import this module and log through its own basicConfig handler.
+    with ProcessPoolExecutor(
+        max_workers=min(len(fpaths), os.cpu_count() or 1),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as ex:
+        # One file per task so every spawned worker gets work (chunksize=4 left most of them idle)
+        results = ex.map(_process_one_pdf, fpaths)
+        return list(chain.from_iterable(results))
@@ -0,0 +1,82 @@
+import re
+from difflib import SequenceMatcher
+from typing import Optional, Tuple
+
+PRODUCT_SYNONYMS = {
+    "AURION CWFS Gelatin": ["CWFS Gelatin", "Aurion Gelatin 40%", "AURION CWFS Gelatin (40%)"],
+    "India Ink Control": ["India Ink", "Ink Control Sample"],
+    "MOBIL SUPER ALL-IN-ONE PROTECTION 0W-20": ["MOBIL SUPER ALL-IN-ONE PROTECTION", "MOBIL SUPER 0W-20", "MOBIL SUPER"],
+    "Mobiltrans HD 30 Dyed Blue": ["Mobiltrans HD 30", "Mobiltrans HD 30"],
+    "FLEXGRIT": ["FLEXGRIT"],
+    "pH Buffer 10.01 colourless": ["pH Buffer 10.01", "pH Buffer colourless"],
+    "SAFTIGRIT BLUE (PREMIUM)": ["SAFTIGRIT BLUE", "SAFTIGRIT BLUE PREMIUM"],
+}
+
+# Lowercased product name / synonym -> canonical product (first product listed wins a shared synonym)
+_SYNONYM_INDEX = {}
+for _product, _synonyms in PRODUCT_SYNONYMS.items():
+    for _name in (_product, *_synonyms):
+        _SYNONYM_INDEX.setdefault(_name.lower(), _product)
+# All names in one case-insensitive alternation, longest first so "MOBIL SUPER 0W-20" beats "MOBIL SUPER".
+# One named group per name: IGNORECASE also matches "ſ"/"İ", which .lower() would not map back to a key.
+_SYNONYM_GROUPS = {f"n{i}": name for i, name in enumerate(sorted(_SYNONYM_INDEX, key=len, reverse=True))}
+_SYNONYM_RE = re.compile(
+    "|".join(f"(?P<{group}>{re.escape(name)})" for group, name in _SYNONYM_GROUPS.items()),
+    re.IGNORECASE,
+)
+
+# Minimum difflib ratio for each typo'd word ("saftigritt", "flexgritt") to count towards a hint
+FUZZY_MIN_RATIO = 0.85
+# Shorter name words must match exactly: one letter off a short word is usually another
+# word ("mobil"/"mobile", "ink"/"pink"), not a typo
+FUZZY_MIN_WORD_LEN = 6
+
+def _tokens(words) -> Tuple[str, ...]:
+    return tuple(w.strip("?!.,;:\"'") for w in words)
+
+def _is_grade(token: str) -> bool:
+    """Tokens with a digit ("30", "10.01", "0w-20") are grades/model numbers and never fuzzed."""
+    return any(c.isdigit() for c in token)
+
+# Names grouped by word count, so fuzzy matching compares like-sized windows of the query
+_NAMES_BY_WORDS = {}
+for _name in _SYNONYM_INDEX:
+    _name_tokens = _tokens(_name.split())
+    _NAMES_BY_WORDS.setdefault(len(_name_tokens), []).append((_name, _name_tokens))
+
+def _window_ratio(window: Tuple[str, ...], name_tokens: Tuple[str, ...], matcher: SequenceMatcher) -> float:
+    """Lowest per-word ratio of a query window against a name, 0.0 as soon as one word misses."""
+    worst = 1.0
+    for token, name_token in zip(window, name_tokens):
+        if token == name_token:
+            continue
+        if _is_grade(token) or _is_grade(name_token) or len(name_token) < FUZZY_MIN_WORD_LEN:
+            return 0.0
+        matcher.set_seqs(token, name_token)
+        if matcher.real_quick_ratio() < FUZZY_MIN_RATIO or matcher.quick_ratio() < FUZZY_MIN_RATIO:
+            return 0.0
+        worst = min(worst, matcher.ratio())
+        if worst < FUZZY_MIN_RATIO:
+            return 0.0
+    return worst
+
+def _fuzzy_product_hint(query: str) -> Optional[str]:
+    """Best product whose name matches a same-length word window of the query, word by word."""
+    words = query.lower().split()
+    best, best_ratio = None, 0.0
+    matcher = SequenceMatcher(autojunk=False)
+    for n, names in _NAMES_BY_WORDS.items():
+        windows = {_tokens(words[i:i + n]) for i in range(len(words) - n + 1)}
+        for name, name_tokens in names:
+            for window in windows:
+                ratio = _window_ratio(window, name_tokens, matcher)
+                if ratio > best_ratio:
+                    best, best_ratio = _SYNONYM_INDEX[name], ratio
+    return best
+
+def extract_product_hint(query: str) -> Optional[str]:
+    m = _SYNONYM_RE.search(query)
+    if m:
+        return _SYNONYM_INDEX[_SYNONYM_GROUPS[m.lastgroup]]
+    # Local typo-tolerant fallback; the LLM only names the product if this misses too
+    return _fuzzy_product_hint(query)
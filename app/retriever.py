@@ -1,70 +1,158 @@
-import os, hashlib
+import os, hashlib, json
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
 from dotenv import load_dotenv
 import logging
-from typing import List
+from typing import Callable, Dict, List
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def _corpus_signature(data_path: str) -> str:
-    """Hash of filenames + sizes + mtimes to avoid re-embedding unchanged corpora."""
-    acc = hashlib.sha256()
-    for root, _, files in os.walk(data_path):
-        for f in sorted(files):
-            if not f.lower().endswith(".pdf"):
-                continue
-            fp = os.path.join(root, f)
-            st = os.stat(fp)
-            acc.update(f.encode("utf-8"))
-            acc.update(str(st.st_size).encode("utf-8"))
-            acc.update(str(int(st.st_mtime)).encode("utf-8"))
-    return acc.hexdigest()
+# Texts per embeddings request; OpenAIEmbeddings splits larger inputs into batches of this size
+EMBED_BATCH_SIZE = 512
+
+@lru_cache(maxsize=1)
+def _embeddings() -> OpenAIEmbeddings:
+    """One embeddings client (and HTTP pool) shared by every index build/load."""
+    return OpenAIEmbeddings(chunk_size=EMBED_BATCH_SIZE, max_retries=6)
+
+# Embedding requests in flight at once; they are network-bound, max_retries absorbs 429s
+EMBED_WORKERS = 4
+
+def _embed_and_upsert(vectordb: Chroma, embeddings: OpenAIEmbeddings, documents: List[Document]) -> None:
+    """
+    Embed EMBED_BATCH_SIZE-text batches concurrently, then upsert them into the collection
+    one batch at a time, in order (Chroma writes stay on this thread).
+    """
+    ids = _doc_ids(documents)
+    batches = [
+        (ids[i:i + EMBED_BATCH_SIZE], documents[i:i + EMBED_BATCH_SIZE])
+        for i in range(0, len(documents), EMBED_BATCH_SIZE)
+    ]
+    with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as pool:
+        vectors = pool.map(lambda b: embeddings.embed_documents([d.page_content for d in b[1]]), batches)
+        for (batch_ids, batch), batch_vectors in zip(batches, vectors):
+            # add_texts would re-embed serially; the collection takes precomputed vectors directly
+            vectordb._collection.upsert(
+                ids=batch_ids,
+                embeddings=batch_vectors,
+                documents=[d.page_content for d in batch],
+                metadatas=[d.metadata for d in batch],
+            )
+
+def _doc_ids(documents: List[Document]) -> List[str]:
+    """Deterministic ids (file|section|chunk index) so re-adding a chunk upserts it."""
+    per_file = Counter()
+    ids = []
+    for doc in documents:
+        file_name = doc.metadata.get("file_name") or os.path.basename(doc.metadata.get("source", ""))
+        idx = per_file[file_name]
+        per_file[file_name] += 1
+        key = f"{file_name}|{doc.metadata.get('section')}|{idx}"
+        ids.append(hashlib.sha1(key.encode("utf-8")).hexdigest())
+    return ids
+
+MANIFEST_FILE = ".corpus.json"
+# HNSW settings for the collection. OpenAI embeddings are unit-length, so inner product ranks
+# exactly like cosine without hnswlib re-normalising every vector and query; switch back to
+# "cosine" if the embedding model ever returns unnormalised vectors.
+# Stored in the manifest: changing them rebuilds the collection.
+HNSW_CONFIG = {"hnsw:space": "ip", "hnsw:construction_ef": 200, "hnsw:M": 32, "hnsw:search_ef": 64}
+
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+def _corpus_manifest(data_path: str, previous: Dict[str, list]) -> Dict[str, list]:
+    """file name -> [size, mtime, sha1]; the sha1 is only recomputed when size or mtime moved."""
+    manifest = {}
+    with os.scandir(data_path) as entries:
+        pdfs = sorted(
+            (e for e in entries if e.name.lower().endswith(".pdf") and e.is_file()),
+            key=lambda e: e.name,
+        )
+    for entry in pdfs:
+        st = entry.stat()
+        size, mtime = st.st_size, int(st.st_mtime)
+        prev = previous.get(entry.name)
+        if prev and prev[0] == size and prev[1] == mtime:
+            digest = prev[2]
+        else:
+            digest = _file_digest(entry.path)
+        manifest[entry.name] = [size, mtime, digest]
+    return manifest
+
+def _read_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_manifest(path: str, manifest: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
 
 def make_vectordb_and_retriever(
-    documents: List[Document],
+    load_documents: Callable[[List[str]], List[Document]],
     persist_directory: str,
     data_path: str,
     collection_name: str = "sds",
     k: int = 5,
 ):
-    embeddings = OpenAIEmbeddings()
-
-    sig = _corpus_signature(data_path)
-    sig_file = os.path.join(persist_directory, ".corpus.sig")
+    """
+    Open (or create) the persisted Chroma collection and bring it in line with the PDFs
+    in data_path. Only added/changed files are passed to load_documents and embedded;
+    chunks of changed or removed files are deleted first.
+    """
+    embeddings = _embeddings()
 
     os.makedirs(persist_directory, exist_ok=True)
+    manifest_file = os.path.join(persist_directory, MANIFEST_FILE)
+    manifest = _read_manifest(manifest_file)
+    previous = manifest.get("files", {}) if manifest.get("index") == HNSW_CONFIG else {}
+    current = _corpus_manifest(data_path, previous)
 
-    need_rebuild = True
-    if os.path.exists(sig_file):
-        with open(sig_file, "r", encoding="utf-8") as f:
-            prev = f.read().strip()
-        if prev == sig:
-            need_rebuild = False
-
-    if need_rebuild:
-        # Fresh build
-        logger.info("Building Chroma from %d documents into %s ...", len(documents), persist_directory)
-        vectordb = Chroma.from_documents(
-            documents=documents,
-            embedding=embeddings,
-            persist_directory=persist_directory,
-            collection_name=collection_name,
-        )
-        with open(sig_file, "w", encoding="utf-8") as f:
-            f.write(sig)
-        logger.info("Chroma built. Persisted to %s", persist_directory)
-    else:
-        # Load existing
-        logger.info("Loading existing Chroma from %s", persist_directory)
-        vectordb = Chroma(
+    def _open():
+        return Chroma(
             persist_directory=persist_directory,
             embedding_function=embeddings,
             collection_name=collection_name,
+            collection_metadata=HNSW_CONFIG,
         )
 
+    vectordb = _open()
+    if not previous:
+        # No manifest (or one for other index settings): nothing in an existing collection can be trusted, start clean
+        vectordb.delete_collection()
+        vectordb = _open()
+
+    removed = previous.keys() - current.keys()
+    changed = {f for f, entry in current.items() if f not in previous or previous[f][2] != entry[2]}
+    stale = sorted(removed | (changed & previous.keys()))
+
+    if stale:
+        ids = vectordb.get(where={"file_name": {"$in": stale}}, include=[])["ids"]
+        if ids:
+            vectordb.delete(ids=ids)
+        logger.info("Dropped %d chunks from %d changed/removed files", len(ids), len(stale))
+
+    if changed:
+        documents = load_documents(sorted(changed))
+        logger.info("Embedding %d documents from %d new/changed files into %s ...", len(documents), len(changed), persist_directory)
+        if documents:
+            _embed_and_upsert(vectordb, embeddings, documents)
+    else:
+        logger.info("Chroma in %s is up to date", persist_directory)
+
+    _write_manifest(manifest_file, {"index": HNSW_CONFIG, "files": current})
+
     retriever = vectordb.as_retriever(search_kwargs={"k": k})
-    return vectordb, retriever
\ No newline at end of file
+    return vectordb, retriever
@@ -1,9 +1,12 @@
+import json
 import logging
-from langchain_openai import ChatOpenAI
+from app.llm import CHAT_MODEL, openai_client
 
-llm = ChatOpenAI(model_name="gpt-3.5-turbo", temperature=0)
 logging.basicConfig(level=logging.INFO)
 
+# Leading characters of each candidate shown to the combined product/section picker
+SNIPPET_CHARS = 200
+
 def choose_relevant_section(query, candidate_sections):
     """Ask LLM to pick the best section heading only (not the content)."""
     options = "\n".join(f"- {doc.metadata.get('section','Unknown')}" for doc in candidate_sections)
@@ -18,5 +21,56 @@ def choose_relevant_section(query, candidate_sections):
     Reply ONLY with the single most relevant section heading (exactly as written above).
     If none are relevant, reply "NONE".
     """
-    resp = llm.invoke(prompt)
-    return resp.content.strip()
+    resp = openai_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0
+    )
+    return resp.choices[0].message.content.strip()
+
+def choose_product_and_section(query, candidate_sections):
+    """
+    One JSON-mode LLM call that names the product the user asks about and picks the best
+    section heading. Used when no product synonym matched, instead of two separate calls.
+    Returns (product or None, section heading or "NONE").
+    Raises ValueError if the reply is not a JSON object, so no caller caches a non-answer.
+    """
+    options = json.dumps(
+        [
+            {
+                "product": doc.metadata.get("product_name", "Unknown"),
+                "section": doc.metadata.get("section", "Unknown"),
+                "text": " ".join(doc.page_content[:SNIPPET_CHARS].split()),
+            }
+            for doc in candidate_sections
+        ],
+        ensure_ascii=False,
+        indent=1,
+    )
+
+    prompt = f"""
+    You are a section classifier.
+    The user asked: "{query}"
+
+    Candidate SDS sections (JSON list; "text" is the start of each section):
+    {options}
+
+    Reply with a JSON object {{"product": "...", "section": "..."}} where
+    "product" is the product the user is asking about, copied exactly from a "product" above, or "NONE" if unsure, and
+    "section" is the single most relevant section heading, copied exactly from a "section" above, or "NONE" if none are relevant.
+    """
+    resp = openai_client().chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0,
+        response_format={"type": "json_object"},
+    )
+    try:
+        picked = json.loads(resp.choices[0].message.content)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"LLM product/section pick was not valid JSON: {e}") from e
+    if not isinstance(picked, dict):
+        raise ValueError(f"LLM product/section pick was not a JSON object: {picked!r}")
+    product = str(picked.get("product") or "").strip()
+    section = str(picked.get("section") or "NONE").strip()
+    return (None if product.upper() in ("", "NONE") else product), section
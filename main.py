@@ -1,19 +1,70 @@
+import asyncio
 import os
+import queue
+import secrets
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Optional, Tuple
+from cachetools import LRUCache, TTLCache
 from dotenv import load_dotenv
 load_dotenv()
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from langchain_core.documents import Document
 from app.loader_pdf import load_sds_documents
+from app.product_hint import extract_product_hint
 from app.retriever import make_vectordb_and_retriever
 import logging
-from app.section_picker import choose_relevant_section
-import logging
-from openai import OpenAI
+import logging.handlers
+from app.section_picker import choose_product_and_section, choose_relevant_section
 
-app = FastAPI()
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+
+# Request threads only enqueue log records; a background listener does the stderr writes.
+# force=True drops the StreamHandler the app.* modules' basicConfig calls installed on import.
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler], force=True)
+# basicConfig gave the QueueHandler BASIC_FORMAT too; it only needs to merge msg % args,
+# the listener's handler adds the level/name prefix
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+# Filled in by _build_index once the vector store is loaded (or its build failed)
+state = {"vectordb": None, "build_failed": False}
+
+async def _build_index():
+    try:
+        vectordb, _ = await asyncio.to_thread(
+            make_vectordb_and_retriever,
+            load_documents=partial(load_sds_documents, PDF_DIR),   # file names -> List[Document]
+            persist_directory=PERSIST_DIR,
+            data_path=PDF_DIR,
+            collection_name="sds"
+        )
+    except Exception:
+        logger.exception("Building the SDS vector store failed; /query stays unavailable.")
+        state["build_failed"] = True
+        return
+    state["vectordb"] = vectordb
+    logger.info("SDS vector store ready.")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _log_listener.start()
+    # Build/load in a worker thread so the server accepts connections right away;
+    # /query answers 503 until the store is ready.
+    boot = asyncio.create_task(_build_index())
+    yield
+    boot.cancel()
+    _log_listener.stop()   # flushes queued records
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow React frontend origin
 origins = [
@@ -28,110 +79,159 @@ app.add_middleware(
     allow_headers=["*"],  # allow all headers
 )
 
+# Cap matches the question length we are willing to embed; longer bodies get a 422 before retrieval.
+MAX_QUESTION_CHARS = 2048
+
 class QueryRequest(BaseModel):
-    question: str
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True, str_max_length=MAX_QUESTION_CHARS)
+
+    question: str = Field(..., min_length=1, max_length=MAX_QUESTION_CHARS)
 
 # ---- Build/load vector store from PDFs ----
 PDF_DIR = "data/sds_pdf"
 PERSIST_DIR = "chroma_store_pdf"
 
-docs = load_sds_documents(pdf_dir=PDF_DIR)   # returns List[Document]
-vectordb, retriever = make_vectordb_and_retriever(
-    documents=docs,
-    persist_directory=PERSIST_DIR,
-    data_path=PDF_DIR,
-    collection_name="sds"
-)
+def _normalize_query(query: str) -> str:
+    """Cache key form of a question: lowercased, whitespace collapsed, edge punctuation dropped."""
+    return " ".join(query.lower().split()).strip(" ?!.,;:")
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-PRODUCT_SYNONYMS = {
-    "AURION CWFS Gelatin": ["CWFS Gelatin", "Aurion Gelatin 40%", "AURION CWFS Gelatin (40%)"],
-    "India Ink Control": ["India Ink", "Ink Control Sample"],
-    "MOBIL SUPER ALL-IN-ONE PROTECTION 0W-20": ["MOBIL SUPER ALL-IN-ONE PROTECTION", "MOBIL SUPER 0W-20", "MOBIL SUPER"],
-    "Mobiltrans HD 30 Dyed Blue": ["Mobiltrans HD 30", "Mobiltrans HD 30"],
-    "FLEXGRIT": ["FLEXGRIT"],
-    "pH Buffer 10.01 colourless": ["pH Buffer 10.01", "pH Buffer colourless"],
-    "SAFTIGRIT BLUE (PREMIUM)": ["SAFTIGRIT BLUE", "SAFTIGRIT BLUE PREMIUM"],
-}
-
-def extract_product_hint(query: str):
-    for product, synonyms in PRODUCT_SYNONYMS.items():
-        if product.lower() in query.lower():
-            return product
-        for syn in synonyms:
-            if syn.lower() in query.lower():
-                return product
-    return None
-
-def extract_product_hint_llm(query: str):
+def _section_key(section: Optional[str]) -> str:
+    """Match key for section headings, tolerant of the LLM echoing quotes, bullets or spacing."""
+    return " ".join((section or "").split()).strip(" \"'`-").lower()
+
+# Candidates fetched when no product synonym matched
+UNHINTED_K = 8
+
+def _search(vectordb, qvec: List[float], k: int, where: Optional[dict] = None) -> List[Document]:
     """
-    Ask the LLM to extract a probable product name from the query.
+    Top-k chunks for a query vector, with their Chroma ids set on the Documents.
+    langchain_community's similarity_search_by_vector leaves Document.id empty, and the ids
+    are what _fetch_candidates re-reads cached picks by.
     """
-    try:
-        prompt = f"""
-        Extract the exact SDS product name from the user query below.
-        Query: "{query}"
-        Return only the product name or return "NONE" if unsure.
-        """
-        resp = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0
-        )
-        return resp.choices[0].message.content.strip()
-    except Exception as e:
-        logging.error("LLM product extraction failed: %s", str(e))
-        return None
-
-@app.post("/query")
-def query_sds(req: QueryRequest):
-    query = req.question
-    # Pass 1: Try synonym-based hinting
-    product_hint = extract_product_hint(query)
-    logging.info("Extracted product hint: %s", product_hint)
-    # Pass 2: Fallback to LLM extraction
-    if not product_hint:
-        product_hint = extract_product_hint_llm(query)
-        if product_hint and product_hint.upper() == "NONE":
-            product_hint = None
+    res = vectordb._collection.query(
+        query_embeddings=[qvec], n_results=k, where=where, include=["documents", "metadatas"]
+    )
+    return [
+        Document(page_content=text, metadata=meta or {}, id=i)
+        for i, text, meta in zip(res["ids"][0], res["documents"][0], res["metadatas"][0])
+    ]
 
+def _retrieve_and_pick(query: str, product_hint: Optional[str]) -> Tuple[Tuple[str, ...], Optional[str], Optional[str]]:
+    """
+    Vector search + LLM pick for the user's question.
+    Returns (chunk ids, product, picked section); _answer caches it per normalised question.
+    """
+    # Embed once; the filtered search and its unfiltered fallback share the vector
+    vectordb = state["vectordb"]
+    qvec = vectordb.embeddings.embed_query(query)
     if product_hint:
-        logging.info("Using product hint: %s", product_hint)
-        candidates = retriever.vectorstore.similarity_search(
-                query,
-                k=5,
-                filter={"product_name": product_hint} if product_hint else None
-        )
+        candidates = _search(vectordb, qvec, k=5, where={"product_name": product_hint})
         if not candidates:  # fallback if product filter too strict
             logging.warning("No hits with product filter, falling back to full search.")
-            candidates = retriever.invoke(query)
+            candidates = _search(vectordb, qvec, k=5)
     else:
         # ❓ OPTION 1: Allow fallback without filter
-        candidates = retriever.invoke(query)
+        # Wider net: the same LLM call also has to find the product among these
+        candidates = _search(vectordb, qvec, k=UNHINTED_K)
         # ❓ OPTION 2: Force user to refine question instead
         # return {"answer": "I couldn’t identify the product from your question. Please mention the product name."}
 
     if not candidates:
-        return {"answer": "ANSWER NOT FOUND IN SDS", "source": None}
+        return (), product_hint, None
 
     logging.info("Retrieved %d candidates for query=%s", len(candidates), query)
-    
-    for i, doc in enumerate(candidates, start=1):
-        logging.info(
-            "Candidate %d: section=%s, product=%s, source=%s",
-            i,
-            doc.metadata.get("section", "UNKNOWN"),
-            doc.metadata.get("product", "UNKNOWN"),
-            doc.metadata.get("source", "UNKNOWN"),
-        )
-        
-    section = choose_relevant_section(query, candidates)
-    logger.info("LLM picked section=%s", section)
 
-    # Return the exact chunk matching that section, verbatim
-    for doc in candidates:
-        if doc.metadata.get("section") == section:
-            return {"answer": doc.page_content, "source": doc.metadata}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Candidates: %s", "; ".join(
+            f"{i}: section={doc.metadata.get('section', 'UNKNOWN')}, "
+            f"product={doc.metadata.get('product_name', 'UNKNOWN')}, "
+            f"source={doc.metadata.get('source', 'UNKNOWN')}"
+            for i, doc in enumerate(candidates, start=1)
+        ))
+
+    if product_hint:
+        product = product_hint
+        section = choose_relevant_section(query, candidates)
+    else:
+        # No synonym hit: one LLM call names the product and picks the section
+        product, section = choose_product_and_section(query, candidates)
+    logger.info("LLM picked product=%s section=%s", product, section)
+    return tuple(doc.id for doc in candidates), product, section
+
+# A fetched candidate chunk; section/product are read out of the metadata once
+Candidate = namedtuple("Candidate", "section product content metadata")
+
+def _fetch_candidates(ids: Tuple[str, ...]) -> List[Candidate]:
+    """Re-read cached candidate chunks from Chroma, in the original ranking order."""
+    if not ids:
+        return []
+    got = state["vectordb"].get(ids=list(ids))
+    by_id = {
+        i: Candidate(meta.get("section"), meta.get("product_name"), text, meta)
+        for i, text, meta in zip(got["ids"], got["documents"], (m or {} for m in got["metadatas"]))
+    }
+    return [by_id[i] for i in ids if i in by_id]
+
+async def _answer(query: str, key: str) -> dict:
+    # Synonym-based hinting; without a hit the LLM names the product together with the section
+    product_hint = extract_product_hint(query)
+    logging.info("Extracted product hint: %s", product_hint)
 
+    # Embedding, Chroma and the LLM are blocking clients: run them off the event loop.
+    # The normalised key only selects the cache entry; the original question is embedded and prompted.
+    pick_key = (key, product_hint)
+    picked = _pick_cache.get(pick_key)
+    if picked is None:
+        picked = await asyncio.to_thread(_retrieve_and_pick, query, product_hint)
+        _pick_cache[pick_key] = picked
+    ids, product, section = picked
+    candidates = await asyncio.to_thread(_fetch_candidates, ids)
+
+    if not candidates:
+        return {"answer": "ANSWER NOT FOUND IN SDS", "source": None}
+
+    # Return the exact chunk matching that section, verbatim. On duplicate headings prefer
+    # the product's chunk, then the highest-ranked one (sorted() is stable).
+    by_section = {}
+    for cand in sorted(candidates, key=lambda c: c.product != product):
+        by_section.setdefault(_section_key(cand.section), cand)
     # Fallback: top chunk
-    return {"answer": candidates[0].page_content, "source": candidates[0].metadata}
\ No newline at end of file
+    cand = by_section.get(_section_key(section)) or candidates[0]
+    return {"answer": cand.content, "source": cand.metadata}
+
+# (chunk ids, product, section) by (normalised question, product hint), so repeat questions skip
+# embedding, search and the LLM; finished /query responses by normalised question.
+# Both are only touched from the event loop thread (never inside to_thread), so they need no lock.
+_pick_cache = LRUCache(maxsize=1024)
+_answer_cache = TTLCache(maxsize=2048, ttl=600)
+
+@app.post("/query", response_class=ORJSONResponse)
+async def query_sds(req: QueryRequest):
+    if state["vectordb"] is None:
+        if state["build_failed"]:
+            raise HTTPException(status_code=503, detail="SDS index build failed; see server logs.")
+        raise HTTPException(status_code=503, detail="SDS index is still loading, try again shortly.")
+    query = req.question
+    key = _normalize_query(query)
+    cached = _answer_cache.get(key)
+    if cached is not None:
+        logging.info("Answer cache hit for query=%s", key)
+        return cached
+    response = await _answer(query, key)
+    _answer_cache[key] = response
+    return response
+
+# Shared secret for /admin/* endpoints, sent as the X-Admin-Token header; they refuse every call while it is unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def _check_admin_token(token: Optional[str]) -> None:
+    if not (ADMIN_TOKEN and token and secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode())):
+        raise HTTPException(status_code=403, detail="Admin token missing or invalid.")
+
+@app.post("/admin/flush-cache")
+async def flush_cache(x_admin_token: Optional[str] = Header(default=None)):
+    """Drop cached answers and retrieval/LLM picks, e.g. after the SDS corpus was re-indexed."""
+    _check_admin_token(x_admin_token)
+    _answer_cache.clear()
+    _pick_cache.clear()
+    return {"status": "ok"}
@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+class FlushCacheTest(unittest.TestCase):
+    def setUp(self):
+        # Not entered as a context manager, so the lifespan (index build) does not run
+        self.client = TestClient(main.app)
+        main._answer_cache["q"] = {"answer": "cached", "source": None}
+        self.addCleanup(main._answer_cache.clear)
+
+    def test_refused_without_configured_token(self):
+        with mock.patch.object(main, "ADMIN_TOKEN", None):
+            resp = self.client.post("/admin/flush-cache", headers={"X-Admin-Token": ""})
+        self.assertEqual(resp.status_code, 403)
+        self.assertIn("q", main._answer_cache)
+
+    def test_refused_with_wrong_or_missing_token(self):
+        with mock.patch.object(main, "ADMIN_TOKEN", "s3cret"):
+            for headers in ({}, {"X-Admin-Token": "nope"}):
+                with self.subTest(headers=headers):
+                    self.assertEqual(self.client.post("/admin/flush-cache", headers=headers).status_code, 403)
+        self.assertIn("q", main._answer_cache)
+
+    def test_flushes_with_token(self):
+        with mock.patch.object(main, "ADMIN_TOKEN", "s3cret"):
+            resp = self.client.post("/admin/flush-cache", headers={"X-Admin-Token": "s3cret"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotIn("q", main._answer_cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
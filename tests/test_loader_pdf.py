@@ -0,0 +1,48 @@
+import unittest
+
+from app.loader_pdf import _SECTION_SPLIT_LOOKAHEAD, _split_into_sections, extract_product_name
+
+
+def _sds(section1: str) -> str:
+    return f"SECTION 1: Identification\n{section1}\nSECTION 2: Hazards identification\nNot classified\n"
+
+
+class ExtractProductNameTest(unittest.TestCase):
+    def test_label_value(self):
+        self.assertEqual(extract_product_name(_sds("Product Name: FLEXGRIT\nSupplier: Acme"), "a.pdf"), "FLEXGRIT")
+
+    def test_label_then_value_on_next_line(self):
+        self.assertEqual(extract_product_name(_sds("Product Name\n  India Ink Control\n"), "a.pdf"), "India Ink Control")
+
+    def test_next_line_label_is_read_as_label(self):
+        self.assertEqual(extract_product_name(_sds("Product Name:\nTrade Name : Zed"), "a.pdf"), "Zed")
+
+    def test_noisy_value_does_not_borrow_next_line(self):
+        text = _sds("Product Name: CAS No. 5\nSome other line\nTrade Name: Zed")
+        self.assertEqual(extract_product_name(text, "a.pdf"), "Zed")
+
+    def test_use_statements_are_skipped(self):
+        self.assertEqual(extract_product_name(_sds("Product: Use: Degreaser\nTrade Name: Zed"), "a.pdf"), "Zed")
+        self.assertEqual(extract_product_name(_sds("Product:\nUse: Degreaser"), "a.pdf"), "UNKNOWN")
+
+    def test_heading_is_not_a_product_name(self):
+        # No Section 1 heading: the fallback block runs into the next section
+        text = "Product Name\nSECTION 02 - Hazards\nNot classified\n"
+        self.assertEqual(extract_product_name(text, "a.pdf"), "UNKNOWN")
+
+
+class SplitIntoSectionsTest(unittest.TestCase):
+    def test_same_sections_as_splitting_on_the_lookahead(self):
+        texts = [
+            "intro\nSECTION 1: Identification\nProduct: X\n\n  2. Hazards\nnone\n3 COMPOSITION\nwater\n",
+            "preface\n\uff12. fullwidth digit heading\nbody\n\u017fection 3: long s\nmore\n",
+            "Sec 04 - First aid\nrinse\n\n\n  section 5 fire\nfoam\n",
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                expected = [p.strip() for p in _SECTION_SPLIT_LOOKAHEAD.split(text) if p.strip()]
+                self.assertEqual([part for _, part in _split_into_sections(text)], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from app.product_hint import extract_product_hint
+
+
+class ProductHintTest(unittest.TestCase):
+    def test_exact_synonym(self):
+        self.assertEqual(extract_product_hint("First aid for Mobil Super 0W-20?"), "MOBIL SUPER ALL-IN-ONE PROTECTION 0W-20")
+
+    def test_case_folded_synonym(self):
+        # IGNORECASE matches these, but .lower() of the hit is not the synonym key
+        self.assertEqual(extract_product_hint("İndia ink"), "India Ink Control")
+        self.assertEqual(extract_product_hint("Mobil ſuper first aid"), "MOBIL SUPER ALL-IN-ONE PROTECTION 0W-20")
+
+    def test_typos_match(self):
+        cases = {
+            "what is the flash point of saftigritt blue": "SAFTIGRIT BLUE (PREMIUM)",
+            "flexgritt disposal": "FLEXGRIT",
+            "ph bufer 10.01 first aid": "pH Buffer 10.01 colourless",
+            "mobiltran hd 30 storage?": "Mobiltrans HD 30 Dyed Blue",
+        }
+        for query, product in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(extract_product_hint(query), product)
+
+    def test_near_misses_do_not_match(self):
+        for query in (
+            "safety of mobiltrans hd 40",
+            "Mobiltrans HD 50 flash point",
+            "ph buffer 4.01 first aid",
+            "flash point of diesel",
+            "mobile super market",
+            "india pink",
+            "the buffer colourless",
+        ):
+            with self.subTest(query=query):
+                self.assertIsNone(extract_product_hint(query))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+import uuid
+from unittest import mock
+
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import main
+
+CHUNKS = [
+    ("FLEXGRIT", "SECTION 9: Physical and chemical properties", "Flash point: not applicable"),
+    ("FLEXGRIT", "SECTION 4: First-aid measures", "Rinse eyes with water"),
+    ("FLEXGRIT", "SECTION 2: Hazards identification", "Not classified as hazardous"),
+    ("SAFTIGRIT BLUE (PREMIUM)", "SECTION 4: First-aid measures", "Seek medical advice"),
+]
+
+
+class RetrievalTest(unittest.TestCase):
+    def setUp(self):
+        # In-memory Chroma with the same langchain wrapper the app uses; only the embeddings are fake
+        self.store = Chroma(
+            collection_name=f"test-{uuid.uuid4().hex}",
+            embedding_function=DeterministicFakeEmbedding(size=16),
+        )
+        self.store.add_texts(
+            texts=[text for _, _, text in CHUNKS],
+            metadatas=[{"product_name": p, "section": s, "file_name": f"{p}.pdf"} for p, s, _ in CHUNKS],
+            ids=[f"id-{i}" for i in range(len(CHUNKS))],
+        )
+        patcher = mock.patch.dict(main.state, {"vectordb": self.store})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.store.delete_collection)
+
+    def test_hinted_pick_round_trips_ids(self):
+        with mock.patch.object(main, "choose_relevant_section", return_value="SECTION 4: First-aid measures"):
+            ids, product, section = main._retrieve_and_pick("FLEXGRIT first aid", "FLEXGRIT")
+        self.assertEqual(sorted(ids), ["id-0", "id-1", "id-2"])
+        self.assertEqual(product, "FLEXGRIT")
+        candidates = main._fetch_candidates(ids)
+        text_by_id = {f"id-{i}": text for i, (_, _, text) in enumerate(CHUNKS)}
+        self.assertEqual([c.content for c in candidates], [text_by_id[i] for i in ids])
+        self.assertTrue(all(c.product == "FLEXGRIT" for c in candidates))
+
+    def test_unhinted_pick_round_trips_ids(self):
+        with mock.patch.object(
+            main, "choose_product_and_section", return_value=("SAFTIGRIT BLUE (PREMIUM)", "SECTION 4: First-aid measures")
+        ):
+            ids, product, _ = main._retrieve_and_pick("first aid", None)
+        self.assertEqual(sorted(ids), [f"id-{i}" for i in range(len(CHUNKS))])
+        self.assertEqual(len(main._fetch_candidates(ids)), len(CHUNKS))
+
+    def test_answer_returns_picked_section_verbatim(self):
+        with mock.patch.object(main, "choose_relevant_section", return_value="SECTION 4: First-aid measures"):
+            answer = asyncio.run(main._answer("Flexgrit first aid?", "flexgrit first aid"))
+        self.assertEqual(answer["answer"], "Rinse eyes with water")
+        self.assertEqual(answer["source"]["product_name"], "FLEXGRIT")
+
+
+if __name__ == "__main__":
+    unittest.main()